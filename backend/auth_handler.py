@@ -1,23 +1,86 @@
 import json
 import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
 import bcrypt
-import jwt
-import uuid
-from datetime import datetime, timedelta
+import base64
+import hashlib
+import hmac
+import time
 import os
-from typing import Dict, Any
+from functools import lru_cache, partial
+from typing import Dict, Any, List
 
-# Initialize AWS services
-dynamodb = boto3.resource('dynamodb')
-cognito_client = boto3.client('cognito-idp')
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configuration
 USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID')
 CLIENT_ID = os.environ.get('COGNITO_CLIENT_ID')
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-jwt-secret-change-this')
 USERS_TABLE = os.environ.get('USERS_TABLE', 'certtracker-users')
+TOKEN_LIFETIME_SECONDS = 30 * 24 * 3600  # Tokens expire in 30 days
 
-users_table = dynamodb.Table(USERS_TABLE)
+# Shared by every response; API Gateway only reads it
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+}
+# bcrypt work factor; each step doubles hashing time, so tune it against the
+# register endpoint's p99 latency target for the Lambda memory size in use
+BCRYPT_COST = int(os.environ.get('BCRYPT_COST', '10'))
+_gensalt = partial(bcrypt.gensalt, rounds=BCRYPT_COST, prefix=b'2b')
+
+# BatchGetItem accepts at most 100 keys and BatchWriteItem 25 requests per call
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+BATCH_MAX_RETRIES = 5
+BATCH_BACKOFF_SECONDS = 0.05
+
+# Provisioned concurrency and SnapStart run init ahead of traffic, so warm-up work there is free
+PREWARM = os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') in ('provisioned-concurrency', 'snap-start')
+
+CLIENT_CONFIG = Config(tcp_keepalive=True, retries={'mode': 'standard', 'max_attempts': 3})
+
+# AWS clients are created on first use and reused for the life of the container
+_dynamodb_client = None
+
+class _Deserializer(TypeDeserializer):
+    """TypeDeserializer that returns ints/floats instead of Decimal so items stay JSON serializable"""
+    
+    def _deserialize_n(self, value):
+        number = super()._deserialize_n(value)
+        return int(number) if number == number.to_integral_value() else float(number)
+
+# Stateless and thread-safe, so one bound pair serves every request in the container
+_serialize = TypeSerializer().serialize
+_deserialize = _Deserializer().deserialize
+
+def get_dynamodb_client():
+    """Return the container-wide low-level DynamoDB client"""
+    global _dynamodb_client
+    if _dynamodb_client is None:
+        _dynamodb_client = boto3.client('dynamodb', config=CLIENT_CONFIG)
+    return _dynamodb_client
+
+def warm_up_table(table_name: str, key: Dict[str, Any]):
+    """Make one cheap read so credentials, endpoints and the connection are ready before traffic"""
+    try:
+        get_dynamodb_client().get_item(TableName=table_name, Key=key)
+    except Exception as e:
+        print(f"Warm-up error: {str(e)}")
+
+def serialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a plain dict to DynamoDB attribute values, leaving out None values"""
+    return {key: _serialize(value) for key, value in item.items() if value is not None}
+
+def deserialize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert DynamoDB attribute values to a plain dict"""
+    return {key: _deserialize(value) for key, value in item.items()}
 
 def lambda_handler(event, context):
     """Main Lambda handler for authentication endpoints"""
@@ -26,17 +89,14 @@ def lambda_handler(event, context):
         # Parse the request
         method = event['httpMethod']
         path = event['path']
-        body = json.loads(event.get('body', '{}'))
+        body = parse_body(event)
         
         # Route to appropriate handler
-        if path == '/auth/login' and method == 'POST':
-            return handle_login(body)
-        elif path == '/auth/register' and method == 'POST':
-            return handle_register(body)
-        elif path == '/auth/logout' and method == 'POST':
-            return handle_logout(event)
-        else:
+        route = ROUTES.get((method, path))
+        if route is None:
             return create_response(404, {'error': 'Endpoint not found'})
+        
+        return route(event, body)
             
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -53,12 +113,17 @@ def handle_login(body: Dict[str, Any]):
     
     try:
         # Get user from DynamoDB
-        response = users_table.get_item(Key={'email': email})
+        response = get_dynamodb_client().get_item(
+            TableName=USERS_TABLE,
+            Key={'email': {'S': email}}
+        )
         
+        # Unknown emails return before bcrypt.checkpw. The timing difference is not a
+        # concern because registration's 409 already reveals whether an email exists.
         if 'Item' not in response:
             return create_response(401, {'error': 'Invalid credentials'})
         
-        user = response['Item']
+        user = deserialize_item(response['Item'])
         
         # Verify password
         if not bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
@@ -96,26 +161,33 @@ def handle_register(body: Dict[str, Any]):
     
     try:
         # Check if user already exists
-        response = users_table.get_item(Key={'email': email})
+        response = get_dynamodb_client().get_item(
+            TableName=USERS_TABLE,
+            Key={'email': {'S': email}}
+        )
         
         if 'Item' in response:
             return create_response(409, {'error': 'User already exists'})
         
         # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = bcrypt.hashpw(password.encode('utf-8'), _gensalt()).decode('utf-8')
         
         # Create user
-        user_id = str(uuid.uuid4())
+        now_iso = utc_now_iso()
+        user_id = generate_id()
         user_data = {
             'id': user_id,
             'email': email,
             'name': name,
             'password_hash': password_hash,
-            'createdAt': datetime.utcnow().isoformat(),
-            'updatedAt': datetime.utcnow().isoformat()
+            'createdAt': now_iso,
+            'updatedAt': now_iso
         }
         
-        users_table.put_item(Item=user_data)
+        get_dynamodb_client().put_item(
+            TableName=USERS_TABLE,
+            Item=serialize_item(user_data)
+        )
         
         # Generate JWT token
         token = generate_jwt_token(user_data)
@@ -143,36 +215,180 @@ def handle_logout(event):
     # by removing the token from storage
     return create_response(200, {'message': 'Logged out successfully'})
 
+# Every token we issue carries the same header, so it is encoded once
+_JWT_HEADER = b'{"alg":"HS256","typ":"JWT"}'
+_JWT_HEADER_B64 = base64.urlsafe_b64encode(_JWT_HEADER).rstrip(b'=')
+_JWT_SECRET_BYTES = JWT_SECRET.encode('utf-8')
+
+def _b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+def _b64url_decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+def _hs256_encode(payload: Dict[str, Any]) -> str:
+    """Encode and sign a JWT with HS256"""
+    
+    signing_input = _JWT_HEADER_B64 + b'.' + _b64url_encode(json_dumps(payload).encode('utf-8'))
+    signature = hmac.new(_JWT_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+    return (signing_input + b'.' + _b64url_encode(signature)).decode('ascii')
+
+def _hs256_decode(token: str) -> Dict[str, Any]:
+    """Check an HS256 JWT signature and return its payload; raises ValueError if invalid"""
+    
+    signing_input, _, signature = token.encode('ascii').rpartition(b'.')
+    header_b64, _, payload_b64 = signing_input.partition(b'.')
+    if not header_b64 or not payload_b64:
+        raise ValueError('Malformed token')
+    
+    if header_b64 != _JWT_HEADER_B64:
+        header = json_loads(_b64url_decode(header_b64))
+        if not isinstance(header, dict):
+            raise ValueError('Malformed token')
+        if header.get('alg') != 'HS256':
+            raise ValueError('Unsupported token algorithm')
+    
+    expected = hmac.new(_JWT_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, _b64url_decode(signature)):
+        raise ValueError('Signature verification failed')
+    
+    payload = json_loads(_b64url_decode(payload_b64))
+    if not isinstance(payload, dict):
+        raise ValueError('Invalid token payload')
+    if 'exp' in payload and not isinstance(payload['exp'], (int, float)):
+        raise ValueError('Invalid exp claim')
+    
+    return payload
+
 def generate_jwt_token(user: Dict[str, Any]) -> str:
     """Generate JWT token for user"""
     
     payload = {
         'user_id': user['id'],
         'email': user['email'],
-        'exp': datetime.utcnow() + timedelta(days=30)  # Token expires in 30 days
+        'exp': int(time.time()) + TOKEN_LIFETIME_SECONDS
     }
     
-    return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
+    return _hs256_encode(payload)
+
+@lru_cache(maxsize=1024)
+def _decode_jwt_token(token: str) -> Dict[str, Any]:
+    """Verify the signature of a token; results are reused within the container"""
+    return _hs256_decode(token)
 
 def verify_jwt_token(token: str) -> Dict[str, Any]:
     """Verify and decode JWT token"""
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise Exception('Token has expired')
-    except jwt.InvalidTokenError:
+        payload = _decode_jwt_token(token)
+    except ValueError:
         raise Exception('Invalid token')
+    
+    if 'exp' in payload and payload['exp'] <= time.time():
+        raise Exception('Token has expired')
+    
+    return dict(payload)
+
+def verify_authentication(event) -> Dict[str, Any]:
+    """Verify JWT token from Authorization header"""
+    
+    try:
+        auth_header = event.get('headers', {}).get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return None
+        
+        token = auth_header.replace('Bearer ', '')
+        return verify_jwt_token(token)
+        
+    except Exception as e:
+        print(f"Auth verification error: {str(e)}")
+        return None
+
+def batch_get_items(table_name: str, keys: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fetch items by key with BatchGetItem, retrying unprocessed keys with backoff"""
+    
+    client = get_dynamodb_client()
+    items = []
+    
+    for start in range(0, len(keys), BATCH_GET_LIMIT):
+        chunk = keys[start:start + BATCH_GET_LIMIT]
+        request_items = {table_name: {'Keys': [serialize_item(key) for key in chunk]}}
+        
+        for attempt in range(BATCH_MAX_RETRIES):
+            response = client.batch_get_item(RequestItems=request_items)
+            items.extend(deserialize_item(item) for item in response.get('Responses', {}).get(table_name, []))
+            
+            request_items = response.get('UnprocessedKeys')
+            if not request_items:
+                break
+            time.sleep(BATCH_BACKOFF_SECONDS * 2 ** attempt)
+        else:
+            raise Exception(f'Unprocessed keys remain for {table_name} after {BATCH_MAX_RETRIES} attempts')
+    
+    return items
+
+def batch_write_items(table_name: str, puts: List[Dict[str, Any]] = (), delete_keys: List[Dict[str, Any]] = ()):
+    """Put and delete items with BatchWriteItem, retrying unprocessed items with backoff"""
+    
+    client = get_dynamodb_client()
+    write_requests = [{'PutRequest': {'Item': serialize_item(item)}} for item in puts]
+    write_requests += [{'DeleteRequest': {'Key': serialize_item(key)}} for key in delete_keys]
+    
+    for start in range(0, len(write_requests), BATCH_WRITE_LIMIT):
+        request_items = {table_name: write_requests[start:start + BATCH_WRITE_LIMIT]}
+        
+        for attempt in range(BATCH_MAX_RETRIES):
+            response = client.batch_write_item(RequestItems=request_items)
+            
+            request_items = response.get('UnprocessedItems')
+            if not request_items:
+                break
+            time.sleep(BATCH_BACKOFF_SECONDS * 2 ** attempt)
+        else:
+            raise Exception(f'Unprocessed items remain for {table_name} after {BATCH_MAX_RETRIES} attempts')
+
+def generate_id() -> str:
+    """Random 128-bit id as 22 base64url characters, shorter than a hyphenated UUID"""
+    return base64.urlsafe_b64encode(os.urandom(16)).rstrip(b'=').decode('ascii')
+
+def utc_now_iso() -> str:
+    """Current UTC time as an ISO 8601 string, formatted without building a datetime"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+def json_dumps(value: Any) -> str:
+    """Serialize a value to a JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value)
+
+def json_loads(value) -> Any:
+    """Parse a JSON string or bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+def parse_body(event) -> Dict[str, Any]:
+    """Decode the JSON request body, treating a missing body as empty"""
+    body = event.get('body')
+    if not body:
+        return {}
+    return json_loads(body)
 
 def create_response(status_code: int, body: Dict[str, Any]):
     """Create standard API response with CORS headers"""
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
-            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-        },
-        'body': json.dumps(body)
-    }
\ No newline at end of file
+        'headers': CORS_HEADERS,
+        'body': json_dumps(body)
+    }
+
+# Routes keyed by (method, path); each handler is called with (event, body)
+ROUTES = {
+    ('POST', '/auth/login'): lambda event, body: handle_login(body),
+    ('POST', '/auth/register'): lambda event, body: handle_register(body),
+    ('POST', '/auth/logout'): lambda event, body: handle_logout(event),
+}
+
+# Other handlers import this module too; Lambda sets _HANDLER to the entry point, e.g. auth_handler.lambda_handler
+if PREWARM and os.environ.get('_HANDLER', '').startswith(__name__ + '.'):
+    warm_up_table(USERS_TABLE, {'email': {'S': 'warm-up@certtracker.invalid'}})
+    bcrypt.hashpw(b'warm-up', bcrypt.gensalt(rounds=4))
@@ -1,19 +1,37 @@
-import json
-import boto3
-import uuid
-from datetime import datetime
+import re
+from datetime import datetime, date
 from typing import Dict, Any, List
 import os
 
-# Initialize AWS services
-dynamodb = boto3.resource('dynamodb')
-s3_client = boto3.client('s3')
+from auth_handler import (
+    PREWARM,
+    batch_get_items,
+    batch_write_items,
+    create_response,
+    deserialize_item,
+    generate_id,
+    get_dynamodb_client,
+    parse_body,
+    serialize_item,
+    utc_now_iso,
+    verify_authentication,
+    warm_up_table,
+)
 
 # Configuration
 CERTIFICATIONS_TABLE = os.environ.get('CERTIFICATIONS_TABLE', 'certtracker-certifications')
 S3_BUCKET = os.environ.get('S3_BUCKET', 'certtracker-documents')
-
-certifications_table = dynamodb.Table(CERTIFICATIONS_TABLE)
+# GSI with userId as HASH and createdAt as RANGE, projecting ALL attributes
+USER_INDEX = os.environ.get('CERTIFICATIONS_USER_INDEX', 'userId-index')
+# Attributes returned by the list endpoint; placeholders avoid clashes with reserved words like name.
+# status is recomputed for every item, and the detail endpoint returns the full item.
+LIST_ATTRIBUTES = ['id', 'name', 'provider', 'issueDate', 'expiryDate']
+LIST_PROJECTION = ', '.join(f'#{name}' for name in LIST_ATTRIBUTES)
+LIST_ATTRIBUTE_NAMES = {f'#{name}': name for name in LIST_ATTRIBUTES + ['userId']}
+MAX_BATCH_SIZE = 100
+REQUIRED_FIELDS = ['name', 'provider', 'issueDate', 'expiryDate']
+# Only these may be cleared by sending null on update; required fields must keep a value
+REMOVABLE_FIELDS = ['reminderDays', 'documentUrl']
 
 def lambda_handler(event, context):
     """Main Lambda handler for certification endpoints"""
@@ -22,8 +40,7 @@ def lambda_handler(event, context):
         # Parse the request
         method = event['httpMethod']
         path = event['path']
-        path_parameters = event.get('pathParameters', {})
-        body = json.loads(event.get('body', '{}'))
+        body = parse_body(event)
         
         # Verify authentication
         user = verify_authentication(event)
@@ -31,55 +48,49 @@ def lambda_handler(event, context):
             return create_response(401, {'error': 'Unauthorized'})
         
         # Route to appropriate handler
-        if path == '/certifications' and method == 'GET':
-            return get_certifications(user['user_id'])
-        elif path == '/certifications' and method == 'POST':
-            return create_certification(user['user_id'], body)
-        elif path.startswith('/certifications/') and method == 'GET':
-            cert_id = path_parameters.get('id')
-            return get_certification(user['user_id'], cert_id)
-        elif path.startswith('/certifications/') and method == 'PUT':
-            cert_id = path_parameters.get('id')
-            return update_certification(user['user_id'], cert_id, body)
-        elif path.startswith('/certifications/') and method == 'DELETE':
-            cert_id = path_parameters.get('id')
-            return delete_certification(user['user_id'], cert_id)
-        else:
-            return create_response(404, {'error': 'Endpoint not found'})
+        route = ROUTES.get((method, path))
+        if route is not None:
+            return route(user['user_id'], body)
+        
+        match = CERTIFICATION_PATH.match(path)
+        route = ITEM_ROUTES.get(method) if match else None
+        if route is not None:
+            return route(user['user_id'], match.group('id'), body)
+        
+        return create_response(404, {'error': 'Endpoint not found'})
             
     except Exception as e:
         print(f"Error: {str(e)}")
         return create_response(500, {'error': 'Internal server error'})
 
-def verify_authentication(event) -> Dict[str, Any]:
-    """Verify JWT token from Authorization header"""
-    
-    try:
-        auth_header = event.get('headers', {}).get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return None
-        
-        token = auth_header.replace('Bearer ', '')
-        return verify_jwt_token(token)
-        
-    except Exception as e:
-        print(f"Auth verification error: {str(e)}")
-        return None
-
 def get_certifications(user_id: str):
     """Get all certifications for a user"""
     
     try:
-        response = certifications_table.scan(
-            FilterExpression='userId = :user_id',
-            ExpressionAttributeValues={':user_id': user_id}
-        )
+        client = get_dynamodb_client()
+        query_kwargs = {
+            'TableName': CERTIFICATIONS_TABLE,
+            'IndexName': USER_INDEX,
+            'KeyConditionExpression': '#userId = :user_id',
+            'ProjectionExpression': LIST_PROJECTION,
+            'ExpressionAttributeNames': LIST_ATTRIBUTE_NAMES,
+            'ExpressionAttributeValues': {':user_id': {'S': user_id}}
+        }
         
-        certifications = response.get('Items', [])
+        certifications = []
+        while True:
+            response = client.query(**query_kwargs)
+            certifications.extend(deserialize_item(item) for item in response.get('Items', []))
+            
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            query_kwargs['ExclusiveStartKey'] = last_key
         
-        # Calculate status for each certification
-        for cert in certifications:
-            cert['status'] = calculate_status(cert['expiryDate'])
+        # Calculate status for all certifications in one pass
+        statuses = calculate_statuses([cert.get('expiryDate') for cert in certifications])
+        for cert, status in zip(certifications, statuses):
+            cert['status'] = status
         
         return create_response(200, {
             'certifications': certifications,
@@ -94,20 +105,21 @@ def get_certification(user_id: str, cert_id: str):
     """Get a specific certification"""
     
     try:
-        response = certifications_table.get_item(
-            Key={'id': cert_id}
+        response = get_dynamodb_client().get_item(
+            TableName=CERTIFICATIONS_TABLE,
+            Key={'id': {'S': cert_id}}
         )
         
         if 'Item' not in response:
             return create_response(404, {'error': 'Certification not found'})
         
-        cert = response['Item']
+        cert = deserialize_item(response['Item'])
         
         # Verify ownership
         if cert['userId'] != user_id:
             return create_response(403, {'error': 'Access denied'})
         
-        cert['status'] = calculate_status(cert['expiryDate'])
+        cert['status'] = calculate_status(cert.get('expiryDate'))
         
         return create_response(200, cert)
         
@@ -115,34 +127,52 @@ def get_certification(user_id: str, cert_id: str):
         print(f"Get certification error: {str(e)}")
         return create_response(500, {'error': 'Failed to fetch certification'})
 
+def validate_certification(body: Dict[str, Any]):
+    """Return an error message if required certification fields are missing"""
+    
+    for field in REQUIRED_FIELDS:
+        if not body.get(field):
+            return f'{field} is required'
+    
+    return None
+
+def build_certification(user_id: str, body: Dict[str, Any], now_iso: str) -> Dict[str, Any]:
+    """Build a new certification record from request data"""
+    
+    cert_id = generate_id()
+    certification = {
+        'id': cert_id,
+        'userId': user_id,
+        'name': body['name'],
+        'provider': body['provider'],
+        'issueDate': body['issueDate'],
+        'expiryDate': body['expiryDate'],
+        'reminderDays': body.get('reminderDays', [90, 60, 30, 7]),
+        'documentUrl': body.get('documentUrl'),
+        'createdAt': now_iso,
+        'updatedAt': now_iso
+    }
+    
+    certification['status'] = calculate_status(certification['expiryDate'])
+    
+    return certification
+
 def create_certification(user_id: str, body: Dict[str, Any]):
     """Create a new certification"""
     
     try:
         # Validate required fields
-        required_fields = ['name', 'provider', 'issueDate', 'expiryDate']
-        for field in required_fields:
-            if not body.get(field):
-                return create_response(400, {'error': f'{field} is required'})
+        error = validate_certification(body)
+        if error:
+            return create_response(400, {'error': error})
         
         # Create certification record
-        cert_id = str(uuid.uuid4())
-        certification = {
-            'id': cert_id,
-            'userId': user_id,
-            'name': body['name'],
-            'provider': body['provider'],
-            'issueDate': body['issueDate'],
-            'expiryDate': body['expiryDate'],
-            'reminderDays': body.get('reminderDays', [90, 60, 30, 7]),
-            'documentUrl': body.get('documentUrl'),
-            'createdAt': datetime.utcnow().isoformat(),
-            'updatedAt': datetime.utcnow().isoformat()
-        }
-        
-        certification['status'] = calculate_status(certification['expiryDate'])
+        certification = build_certification(user_id, body, utc_now_iso())
         
-        certifications_table.put_item(Item=certification)
+        get_dynamodb_client().put_item(
+            TableName=CERTIFICATIONS_TABLE,
+            Item=serialize_item(certification)
+        )
         
         return create_response(201, certification)
         
@@ -150,33 +180,94 @@ def create_certification(user_id: str, body: Dict[str, Any]):
         print(f"Create certification error: {str(e)}")
         return create_response(500, {'error': 'Failed to create certification'})
 
-def update_certification(user_id: str, cert_id: str, body: Dict[str, Any]):
-    """Update an existing certification"""
+def create_certifications(user_id: str, body: Dict[str, Any]):
+    """Create several certifications in one batched write"""
     
     try:
-        # Get existing certification
-        response = certifications_table.get_item(Key={'id': cert_id})
+        items = body.get('certifications')
+        if not isinstance(items, list) or not items:
+            return create_response(400, {'error': 'certifications must be a non-empty list'})
         
-        if 'Item' not in response:
-            return create_response(404, {'error': 'Certification not found'})
+        if len(items) > MAX_BATCH_SIZE:
+            return create_response(400, {'error': f'At most {MAX_BATCH_SIZE} certifications per request'})
         
-        cert = response['Item']
+        # Validate every item before writing any of them
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                return create_response(400, {'error': f'certifications[{index}] must be an object'})
+            error = validate_certification(item)
+            if error:
+                return create_response(400, {'error': f'certifications[{index}]: {error}'})
         
-        # Verify ownership
-        if cert['userId'] != user_id:
-            return create_response(403, {'error': 'Access denied'})
+        now_iso = utc_now_iso()
+        certifications = [build_certification(user_id, item, now_iso) for item in items]
         
-        # Update fields
-        updatable_fields = ['name', 'provider', 'issueDate', 'expiryDate', 'reminderDays', 'documentUrl']
+        batch_write_items(CERTIFICATIONS_TABLE, puts=certifications)
         
-        for field in updatable_fields:
-            if field in body:
-                cert[field] = body[field]
+        return create_response(201, {
+            'certifications': certifications,
+            'count': len(certifications)
+        })
         
-        cert['status'] = calculate_status(cert['expiryDate'])
-        cert['updatedAt'] = datetime.utcnow().isoformat()
+    except Exception as e:
+        print(f"Batch create certifications error: {str(e)}")
+        return create_response(500, {'error': 'Failed to create certifications'})
+
+def get_certifications_by_ids(ids: List[str]) -> List[Dict[str, Any]]:
+    """Fetch multiple certifications with BatchGetItem"""
+    
+    unique_ids = list(dict.fromkeys(ids))
+    return batch_get_items(CERTIFICATIONS_TABLE, [{'id': cert_id} for cert_id in unique_ids])
+
+def update_certification(user_id: str, cert_id: str, body: Dict[str, Any]):
+    """Update an existing certification"""
+    
+    try:
+        # Update only the fields present in the request
+        updatable_fields = REQUIRED_FIELDS + REMOVABLE_FIELDS
+        
+        changes = {field: body[field] for field in updatable_fields if field in body}
+        # Required fields may be changed but not cleared, matching validate_certification
+        for field in REQUIRED_FIELDS:
+            if field in changes and not changes[field]:
+                return create_response(400, {'error': f'{field} is required'})
+        if 'expiryDate' in changes:
+            changes['status'] = calculate_status(changes['expiryDate'])
+        changes['updatedAt'] = utc_now_iso()
+        
+        # Optional fields set to null are removed rather than stored as NULL
+        removals = [field for field, value in changes.items() if value is None]
+        updates = [field for field, value in changes.items() if value is not None]
+        
+        expression = 'SET ' + ', '.join(f'#{field} = :{field}' for field in updates)
+        if removals:
+            expression += ' REMOVE ' + ', '.join(f'#{field}' for field in removals)
+        
+        names = {f'#{field}': field for field in changes}
+        names['#id'] = 'id'
+        values = {f':{field}': changes[field] for field in updates}
+        values[':user_id'] = user_id
+        
+        client = get_dynamodb_client()
+        try:
+            # Ownership is checked by the condition so the update is a single round-trip
+            response = client.update_item(
+                TableName=CERTIFICATIONS_TABLE,
+                Key={'id': {'S': cert_id}},
+                UpdateExpression=expression,
+                ConditionExpression='attribute_exists(#id) AND userId = :user_id',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=serialize_item(values),
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except client.exceptions.ConditionalCheckFailedException as e:
+            if 'Item' not in e.response:
+                return create_response(404, {'error': 'Certification not found'})
+            return create_response(403, {'error': 'Access denied'})
         
-        certifications_table.put_item(Item=cert)
+        cert = deserialize_item(response['Attributes'])
+        cert['status'] = calculate_status(cert.get('expiryDate'))
         
         return create_response(200, cert)
         
@@ -189,19 +280,25 @@ def delete_certification(user_id: str, cert_id: str):
     
     try:
         # Get existing certification
-        response = certifications_table.get_item(Key={'id': cert_id})
+        response = get_dynamodb_client().get_item(
+            TableName=CERTIFICATIONS_TABLE,
+            Key={'id': {'S': cert_id}}
+        )
         
         if 'Item' not in response:
             return create_response(404, {'error': 'Certification not found'})
         
-        cert = response['Item']
+        cert = deserialize_item(response['Item'])
         
         # Verify ownership
         if cert['userId'] != user_id:
             return create_response(403, {'error': 'Access denied'})
         
         # Delete from DynamoDB
-        certifications_table.delete_item(Key={'id': cert_id})
+        get_dynamodb_client().delete_item(
+            TableName=CERTIFICATIONS_TABLE,
+            Key={'id': {'S': cert_id}}
+        )
         
         return create_response(200, {'message': 'Certification deleted successfully'})
         
@@ -209,22 +306,94 @@ def delete_certification(user_id: str, cert_id: str):
         print(f"Delete certification error: {str(e)}")
         return create_response(500, {'error': 'Failed to delete certification'})
 
+def delete_certifications(user_id: str, body: Dict[str, Any]):
+    """Delete several certifications in one batched write"""
+    
+    try:
+        ids = body.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return create_response(400, {'error': 'ids must be a non-empty list'})
+        
+        if len(ids) > MAX_BATCH_SIZE:
+            return create_response(400, {'error': f'At most {MAX_BATCH_SIZE} certifications per request'})
+        
+        for index, cert_id in enumerate(ids):
+            if not isinstance(cert_id, str) or not cert_id:
+                return create_response(400, {'error': f'ids[{index}] must be a non-empty string'})
+        
+        certifications = get_certifications_by_ids(ids)
+        
+        if len(certifications) != len(set(ids)):
+            return create_response(404, {'error': 'Certification not found'})
+        
+        # Verify ownership of every item before deleting any of them
+        if any(cert['userId'] != user_id for cert in certifications):
+            return create_response(403, {'error': 'Access denied'})
+        
+        batch_write_items(CERTIFICATIONS_TABLE, delete_keys=[{'id': cert['id']} for cert in certifications])
+        
+        return create_response(200, {
+            'message': 'Certifications deleted successfully',
+            'count': len(certifications)
+        })
+        
+    except Exception as e:
+        print(f"Batch delete certifications error: {str(e)}")
+        return create_response(500, {'error': 'Failed to delete certifications'})
+
 def calculate_status(expiry_date: str) -> str:
     """Calculate certification status based on expiry date"""
+    return calculate_statuses([expiry_date])[0]
+
+def calculate_statuses(expiry_dates: List[str]) -> List[str]:
+    """Calculate statuses for many expiry dates against a single reading of today's date"""
+    
+    today = date.today()
+    statuses = []
+    
+    for expiry_date in expiry_dates:
+        try:
+            expiry = parse_expiry_date(expiry_date)
+        except Exception:
+            statuses.append('unknown')
+            continue
+        statuses.append(status_from_days((expiry - today).days))
+    
+    return statuses
+
+def parse_expiry_date(expiry_date: str) -> date:
+    """Parse a stored expiry date, reading the YYYY-MM-DD prefix first and falling back to a full ISO timestamp"""
     
     try:
-        from datetime import datetime, date
-        
-        expiry = datetime.fromisoformat(expiry_date.replace('Z', '')).date()
-        today = date.today()
-        days_until_expiry = (expiry - today).days
-        
-        if days_until_expiry < 0:
-            return 'expired'
-        elif days_until_expiry <= 30:
-            return 'expiring'
-        else:
-            return 'active'
-            
-    except Exception:
-        return 'unknown'
\ No newline at end of file
+        return date.fromisoformat(expiry_date[:10])
+    except ValueError:
+        return datetime.fromisoformat(expiry_date.rstrip('Z')).date()
+
+def status_from_days(days_until_expiry: int) -> str:
+    """Map days until expiry to a certification status"""
+    
+    if days_until_expiry < 0:
+        return 'expired'
+    elif days_until_expiry <= 30:
+        return 'expiring'
+    else:
+        return 'active'
+
+# Routes keyed by (method, path); each handler is called with (user_id, body)
+ROUTES = {
+    ('GET', '/certifications'): lambda user_id, body: get_certifications(user_id),
+    ('POST', '/certifications'): create_certification,
+    ('POST', '/certifications/batch'): create_certifications,
+    ('DELETE', '/certifications/batch'): delete_certifications,
+}
+
+# Routes for /certifications/{id} keyed by method; each handler is called with (user_id, cert_id, body)
+CERTIFICATION_PATH = re.compile(r'^/certifications/(?P<id>[^/]+)$')
+ITEM_ROUTES = {
+    'GET': lambda user_id, cert_id, body: get_certification(user_id, cert_id),
+    'PUT': update_certification,
+    'DELETE': lambda user_id, cert_id, body: delete_certification(user_id, cert_id),
+}
+
+if PREWARM:
+    warm_up_table(CERTIFICATIONS_TABLE, {'id': {'S': 'warm-up'}})
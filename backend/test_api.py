@@ -1,9 +1,15 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
 # Test configuration
 API_BASE_URL = "https://6hiswqeu8e.execute-api.us-east-1.amazonaws.com/prod"
 
+# One keep-alive session for every call so only the first request pays for the TLS handshake
+SESSION = requests.Session()
+SESSION.headers.update({'Connection': 'keep-alive'})
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
 def test_auth_endpoints():
     """Test authentication endpoints"""
     
@@ -18,7 +24,7 @@ def test_auth_endpoints():
         "name": "Test User"
     }
     
-    response = requests.post(f"{API_BASE_URL}/auth/register", json=register_data)
+    response = SESSION.post(f"{API_BASE_URL}/auth/register", json=register_data)
     print(f"   Status: {response.status_code}")
     if response.status_code == 201:
         auth_data = response.json()
@@ -36,7 +42,7 @@ def test_auth_endpoints():
         "password": "testpass123"
     }
     
-    response = requests.post(f"{API_BASE_URL}/auth/login", json=login_data)
+    response = SESSION.post(f"{API_BASE_URL}/auth/login", json=login_data)
     print(f"   Status: {response.status_code}")
     if response.status_code == 200:
         auth_data = response.json()
@@ -65,7 +71,7 @@ def test_certification_endpoints(token):
         "reminderDays": [90, 60, 30, 7]
     }
     
-    response = requests.post(f"{API_BASE_URL}/certifications", json=cert_data, headers=headers)
+    response = SESSION.post(f"{API_BASE_URL}/certifications", json=cert_data, headers=headers)
     print(f"   Status: {response.status_code}")
     if response.status_code == 201:
         cert = response.json()
@@ -77,7 +83,7 @@ def test_certification_endpoints(token):
     
     # Test getting certifications
     print("\n2. Testing certification retrieval...")
-    response = requests.get(f"{API_BASE_URL}/certifications", headers=headers)
+    response = SESSION.get(f"{API_BASE_URL}/certifications", headers=headers)
     print(f"   Status: {response.status_code}")
     if response.status_code == 200:
         data = response.json()
@@ -1,17 +1,91 @@
-import json
 import boto3
-import uuid
+from boto3.s3.transfer import TransferConfig
 import base64
+import hashlib
+import hmac
+import io
+import time
+from functools import lru_cache
 from typing import Dict, Any
+from urllib.parse import quote
 import os
 
-# Initialize AWS services
-s3_client = boto3.client('s3')
+from auth_handler import CLIENT_CONFIG, PREWARM, create_response, generate_id, parse_body, verify_authentication
 
 # Configuration
 S3_BUCKET = os.environ.get('S3_BUCKET', 'certtracker-documents')
 ALLOWED_EXTENSIONS = ['.pdf', '.jpg', '.jpeg', '.png', '.doc', '.docx']
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+PRESIGNED_URL_EXPIRES = 3600 * 24 * 7  # 7 days
+AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+
+# Uploads are capped at MAX_FILE_SIZE, so always send a single PUT without a transfer thread pool
+UPLOAD_CONFIG = TransferConfig(multipart_threshold=MAX_FILE_SIZE + 1, use_threads=False)
+
+# S3 client is created on first use and reused for the life of the container
+_s3_client = None
+
+def get_s3_client():
+    """Return the container-wide S3 client"""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client('s3', config=CLIENT_CONFIG)
+    return _s3_client
+
+# Credentials are resolved once; refreshable providers still rotate on get_frozen_credentials()
+_credentials = None
+
+def get_credentials():
+    """Return the container-wide AWS credentials"""
+    global _credentials
+    if _credentials is None:
+        _credentials = boto3.Session().get_credentials()
+    return _credentials
+
+def _hmac_sha256(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+@lru_cache(maxsize=4)
+def _signing_key(secret_key: str, datestamp: str, region: str) -> bytes:
+    """Derive the SigV4 signing key, which only changes once a day"""
+    key = _hmac_sha256(('AWS4' + secret_key).encode('utf-8'), datestamp)
+    key = _hmac_sha256(key, region)
+    key = _hmac_sha256(key, 's3')
+    return _hmac_sha256(key, 'aws4_request')
+
+def presign_get(bucket: str, key: str, expires: int) -> str:
+    """Build a SigV4 presigned GET URL for an S3 object without going through botocore"""
+    
+    credentials = get_credentials().get_frozen_credentials()
+    amz_date = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+    datestamp = amz_date[:8]
+    scope = f"{datestamp}/{AWS_REGION}/s3/aws4_request"
+    host = f"{bucket}.s3.{AWS_REGION}.amazonaws.com"
+    path = '/' + quote(key, safe='/')
+    
+    params = {
+        'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+        'X-Amz-Credential': f"{credentials.access_key}/{scope}",
+        'X-Amz-Date': amz_date,
+        'X-Amz-Expires': str(expires),
+        'X-Amz-SignedHeaders': 'host'
+    }
+    if credentials.token:
+        params['X-Amz-Security-Token'] = credentials.token
+    
+    query = '&'.join(f"{name}={quote(value, safe='')}" for name, value in sorted(params.items()))
+    canonical_request = f"GET\n{path}\n{query}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256',
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+    ])
+    
+    signing_key = _signing_key(credentials.secret_key, datestamp, AWS_REGION)
+    signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+    
+    return f"https://{host}{path}?{query}&X-Amz-Signature={signature}"
 
 def lambda_handler(event, context):
     """Handle file upload to S3"""
@@ -56,7 +130,7 @@ def handle_base64_upload(event, user):
     """Handle base64 encoded file upload"""
     
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = parse_body(event)
         
         file_content = body.get('file')
         filename = body.get('filename')
@@ -65,38 +139,38 @@ def handle_base64_upload(event, user):
         if not file_content or not filename:
             return create_response(400, {'error': 'File content and filename are required'})
         
-        # Decode base64 content
-        file_data = base64.b64decode(file_content)
-        
-        # Validate file size
-        if len(file_data) > MAX_FILE_SIZE:
-            return create_response(400, {'error': 'File size exceeds 10MB limit'})
-        
-        # Generate unique filename
         file_extension = os.path.splitext(filename)[1].lower()
         if file_extension not in ALLOWED_EXTENSIONS:
             return create_response(400, {'error': 'File type not allowed'})
         
-        unique_filename = f"{user['user_id']}/{uuid.uuid4()}{file_extension}"
+        # Validate file size from the encoded length so oversize files are never decoded
+        decoded_size = (len(file_content) * 3) // 4 - file_content[-2:].count('=')
+        if decoded_size > MAX_FILE_SIZE:
+            return create_response(400, {'error': 'File size exceeds 10MB limit'})
+        
+        # Decode base64 content; BytesIO wraps the decoded bytes without copying them
+        file_obj = io.BytesIO(base64.b64decode(file_content))
+        
+        # Generate unique filename
+        unique_filename = f"{user['user_id']}/{generate_id()}{file_extension}"
         
         # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=unique_filename,
-            Body=file_data,
-            ContentType=content_type,
-            Metadata={
-                'userId': user['user_id'],
-                'originalFilename': filename
-            }
+        get_s3_client().upload_fileobj(
+            file_obj,
+            S3_BUCKET,
+            unique_filename,
+            ExtraArgs={
+                'ContentType': content_type,
+                'Metadata': {
+                    'userId': user['user_id'],
+                    'originalFilename': filename
+                }
+            },
+            Config=UPLOAD_CONFIG
         )
         
         # Generate presigned URL for access
-        file_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': S3_BUCKET, 'Key': unique_filename},
-            ExpiresIn=3600 * 24 * 7  # 7 days
-        )
+        file_url = presign_get(S3_BUCKET, unique_filename, PRESIGNED_URL_EXPIRES)
         
         return create_response(200, {
             'url': file_url,
@@ -123,10 +197,14 @@ def handle_file_delete(event, user):
             return create_response(403, {'error': 'Access denied'})
         
         # Delete from S3
-        s3_client.delete_object(Bucket=S3_BUCKET, Key=file_key)
+        get_s3_client().delete_object(Bucket=S3_BUCKET, Key=file_key)
         
         return create_response(200, {'message': 'File deleted successfully'})
         
     except Exception as e:
         print(f"File delete error: {str(e)}")
         return create_response(500, {'error': 'Delete failed'})
+
+if PREWARM:
+    get_s3_client()
+    get_credentials()
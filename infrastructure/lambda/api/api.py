@@ -1,71 +1,153 @@
 import json
 import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 import os
 import uuid
 import base64
 import hmac
 import hashlib
-from datetime import datetime
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import datetime, timezone
+from decimal import Decimal
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# PyJWT is only needed to verify bearer tokens when no authorizer ran
+try:
+    import jwt
+except ImportError:
+    jwt = None
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Keep connections warm across invocations and leave room for concurrent calls
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
 # AWS clients
-dynamodb = boto3.resource('dynamodb')
-cognito = boto3.client('cognito-idp')
+dynamodb = boto3.resource('dynamodb', config=CLIENT_CONFIG)
+cognito = boto3.client('cognito-idp', config=CLIENT_CONFIG)
 
 # Environment variables
 USERS_TABLE = os.environ.get('USERS_TABLE', 'CertTracker-Users')
 CERTIFICATIONS_TABLE = os.environ.get('CERTIFICATIONS_TABLE', 'CertTracker-Certifications')
 USER_POOL_ID = os.environ.get('USER_POOL_ID')
 CLIENT_ID = os.environ.get('USER_POOL_CLIENT_ID')
+AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+TOKEN_ISSUER = f"https://cognito-idp.{AWS_REGION}.amazonaws.com/{USER_POOL_ID}"
+
+# SECRET_HASH inputs, encoded once per container
+_CLIENT_SECRET_BYTES = os.environ.get('CLIENT_SECRET', '').encode('utf-8')
+_CLIENT_ID_BYTES = (CLIENT_ID or '').encode('utf-8')
+
+# Cognito profiles of recently logged-in users, keyed by email: (expires_at, user)
+USER_CACHE_TTL = 300
+USER_CACHE_SIZE = 1000
+USER_CACHE = OrderedDict()
+
+# Table handles are built once per container
+users_table = dynamodb.Table(USERS_TABLE)
+certs_table = dynamodb.Table(CERTIFICATIONS_TABLE)
+
+# BatchWriteItem accepts at most 25 puts per request
+BATCH_WRITE_LIMIT = 25
+BATCH_MAX_RETRIES = 5
+
+# Attributes returned by the list endpoint; placeholders avoid clashes with reserved words like name
+LIST_ATTRIBUTES = ['certId', 'name', 'provider', 'issueDate', 'expiryDate', 'status', 'reminderDays']
+LIST_PROJECTION = ', '.join(f'#{name}' for name in LIST_ATTRIBUTES)
+LIST_ATTRIBUTE_NAMES = {f'#{name}': name for name in LIST_ATTRIBUTES}
+
+# Shared by every response; API Gateway only reads it
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+    'Content-Type': 'application/json'
+}
+
+def _json_default(value):
+    """Encode DynamoDB Decimal values as plain JSON numbers"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def json_dumps(value):
+    """Serialize a value to a JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default).decode('utf-8')
+    return json.dumps(value, separators=(',', ':'), default=_json_default)
+
+def _respond(status_code, payload=None):
+    """Build an API Gateway proxy response with the shared CORS headers"""
+    body = '' if payload is None else json_dumps(payload)
+    return {'statusCode': status_code, 'headers': CORS_HEADERS, 'body': body}
+
+def parse_body(event):
+    """Decode the JSON request body, treating a missing body as empty"""
+    body = event.get('body')
+    if not body:
+        return {}
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
 
 def handler(event, context):
     """Main API handler with production auth"""
     
-    logger.info(f"Event: {json.dumps(event)}")
+    method = event.get('httpMethod')
+    
+    # CORS preflight: answer before any logging or body handling
+    if method == 'OPTIONS':
+        return _respond(204)
     
-    headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
-        'Content-Type': 'application/json'
-    }
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Event: %s", json_dumps(event))
     
     try:
-        method = event.get('httpMethod')
         path = event.get('path', '/')
         
-        if method == 'OPTIONS':
-            return {'statusCode': 200, 'headers': headers, 'body': ''}
+        # Dispatch on the first path segment, e.g. /certifications/123 -> 'certifications'
+        route = ROUTES.get(path.lstrip('/').split('/', 1)[0])
+        if route is None:
+            return _respond(404, {'error': 'Not found'})
         
-        if path.startswith('/auth'):
-            return handle_auth(event, headers)
-        elif path.startswith('/certifications'):
-            return handle_certifications(event, headers)
-        else:
-            return {'statusCode': 404, 'headers': headers, 'body': json.dumps({'error': 'Not found'})}
+        # Decode the body once; handlers read it from event['_body']
+        event['_body'] = parse_body(event)
+        
+        return route(event)
             
     except Exception as e:
         logger.error(f"Error: {str(e)}")
-        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+        return _respond(500, {'error': str(e)})
 
-def handle_auth(event, headers):
+def handle_auth(event):
     """Handle authentication with Cognito"""
     
     method = event.get('httpMethod')
-    body = json.loads(event.get('body', '{}'))
+    body = event['_body']
     
     if method == 'POST':
         if 'name' in body:  # Registration
-            return register_user(body, headers)
+            return register_user(body)
         else:  # Login
-            return login_user(body, headers)
+            return login_user(body)
     
-    return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'Invalid request'})}
+    return _respond(400, {'error': 'Invalid request'})
 
-def register_user(body, headers):
+def register_user(body):
     """Register user with Cognito"""
     
     try:
@@ -86,39 +168,40 @@ def register_user(body, headers):
             MessageAction='SUPPRESS'
         )
         
-        # Set permanent password
-        cognito.admin_set_user_password(
-            UserPoolId=USER_POOL_ID,
-            Username=email,
-            Password=password,
-            Permanent=True
-        )
-        
-        # Store user profile
         user_id = response['User']['Username']
-        users_table = dynamodb.Table(USERS_TABLE)
         
-        users_table.put_item(Item={
-            'userId': user_id,
-            'email': email,
-            'name': name,
-            'createdAt': datetime.utcnow().isoformat()
-        })
+        # Set permanent password and store user profile; neither depends on the other
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(
+                    cognito.admin_set_user_password,
+                    UserPoolId=USER_POOL_ID,
+                    Username=email,
+                    Password=password,
+                    Permanent=True
+                ),
+                executor.submit(put_items_bulk, USERS_TABLE, [{
+                    'userId': user_id,
+                    'email': email,
+                    'name': name,
+                    'createdAt': datetime.utcnow().isoformat()
+                }])
+            ]
         
-        return {
-            'statusCode': 201,
-            'headers': headers,
-            'body': json.dumps({
-                'message': 'User registered successfully',
-                'user': {'id': user_id, 'email': email, 'name': name}
-            })
-        }
+        # Leaving the pool waits for both calls; surface the first failure, if any
+        for future in futures:
+            future.result()
+        
+        return _respond(201, {
+            'message': 'User registered successfully',
+            'user': {'id': user_id, 'email': email, 'name': name}
+        })
         
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
-        return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+        return _respond(400, {'error': str(e)})
 
-def login_user(body, headers):
+def login_user(body):
     """Login with Cognito and return JWT tokens"""
     
     try:
@@ -132,8 +215,7 @@ def login_user(body, headers):
         }
         
         # Only add SECRET_HASH if client secret exists
-        client_secret = os.environ.get('CLIENT_SECRET')
-        if client_secret:
+        if _CLIENT_SECRET_BYTES:
             auth_params['SECRET_HASH'] = calculate_secret_hash(email)
         
         # Authenticate with Cognito
@@ -144,59 +226,89 @@ def login_user(body, headers):
             AuthParameters=auth_params
         )
         
-        # Get user details
-        user_response = cognito.admin_get_user(
-            UserPoolId=USER_POOL_ID,
-            Username=email
-        )
-        
-        # Extract user attributes
-        user_attrs = {attr['Name']: attr['Value'] for attr in user_response['UserAttributes']}
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'message': 'Login successful',
-                'user': {
-                    'id': user_response['Username'],
-                    'email': user_attrs.get('email'),
-                    'name': user_attrs.get('name')
-                },
-                'tokens': {
-                    'AccessToken': response['AuthenticationResult']['AccessToken'],
-                    'IdToken': response['AuthenticationResult']['IdToken'],
-                    'RefreshToken': response['AuthenticationResult']['RefreshToken']
-                }
-            })
-        }
+        return _respond(200, {
+            'message': 'Login successful',
+            'user': get_cognito_user(email),
+            'tokens': {
+                'AccessToken': response['AuthenticationResult']['AccessToken'],
+                'IdToken': response['AuthenticationResult']['IdToken'],
+                'RefreshToken': response['AuthenticationResult']['RefreshToken']
+            }
+        })
         
     except cognito.exceptions.NotAuthorizedException:
-        return {'statusCode': 401, 'headers': headers, 'body': json.dumps({'error': 'Invalid credentials'})}
+        return _respond(401, {'error': 'Invalid credentials'})
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
-        return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+        return _respond(400, {'error': str(e)})
+
+def put_items_bulk(table_name, items):
+    """Write items with BatchWriteItem in chunks of 25, retrying unprocessed puts with backoff"""
+    
+    client = dynamodb.meta.client
+    
+    # A lone item doesn't need the batch envelope or its partial-failure handling
+    if len(items) == 1:
+        client.put_item(TableName=table_name, Item=items[0])
+        return
+    
+    for start in range(0, len(items), BATCH_WRITE_LIMIT):
+        chunk = items[start:start + BATCH_WRITE_LIMIT]
+        request_items = {table_name: [{'PutRequest': {'Item': item}} for item in chunk]}
+        
+        for attempt in range(BATCH_MAX_RETRIES):
+            response = client.batch_write_item(RequestItems=request_items)
+            
+            request_items = response.get('UnprocessedItems')
+            if not request_items:
+                break
+            time.sleep(2 ** attempt * 0.05)
+        else:
+            raise Exception(f"Unprocessed items remain in {table_name} after {BATCH_MAX_RETRIES} attempts")
+
+def get_cognito_user(email):
+    """Get a user's id, email and name from Cognito, cached per container for USER_CACHE_TTL seconds"""
+    
+    now = time.time()
+    cached = USER_CACHE.get(email)
+    if cached and cached[0] > now:
+        USER_CACHE.move_to_end(email)
+        return cached[1]
+    
+    user_response = cognito.admin_get_user(
+        UserPoolId=USER_POOL_ID,
+        Username=email
+    )
+    
+    # Extract user attributes
+    user_attrs = {attr['Name']: attr['Value'] for attr in user_response['UserAttributes']}
+    user = {
+        'id': user_response['Username'],
+        'email': user_attrs.get('email'),
+        'name': user_attrs.get('name')
+    }
+    
+    USER_CACHE[email] = (now + USER_CACHE_TTL, user)
+    USER_CACHE.move_to_end(email)
+    if len(USER_CACHE) > USER_CACHE_SIZE:
+        USER_CACHE.popitem(last=False)
+    
+    return user
 
+@lru_cache(maxsize=1024)
 def calculate_secret_hash(username):
     """Calculate secret hash for Cognito client"""
     
-    client_secret = os.environ.get('CLIENT_SECRET', '')
-    if not client_secret:
+    if not _CLIENT_SECRET_BYTES:
         return None
-        
-    message = username + CLIENT_ID
-    key = client_secret.encode('utf-8')
-    message = message.encode('utf-8')
     
-    dig = hmac.new(key, message, hashlib.sha256).digest()
+    message = username.encode('utf-8') + _CLIENT_ID_BYTES
+    dig = hmac.new(_CLIENT_SECRET_BYTES, message, hashlib.sha256).digest()
     return base64.b64encode(dig).decode()
 
-def handle_certifications(event, headers):
+def handle_certifications(event):
     """Handle certification endpoints - protected by Cognito"""
     
-    # Debug: Log the entire event to see structure
-    logger.info(f"Full event: {json.dumps(event)}")
-    
     # Try different paths for user info
     user_id = None
     request_context = event.get('requestContext', {})
@@ -212,69 +324,87 @@ def handle_certifications(event, headers):
         user_id = request_context.get('identity', {}).get('cognitoIdentityId')
         logger.info(f"Method 2 - Identity: {request_context.get('identity')}")
     
+    # Method 3: Validate the bearer ID token ourselves (direct invoke or no authorizer)
+    if not user_id and jwt is not None:
+        auth_header = (event.get('headers') or {}).get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            try:
+                user_id = verify_token(auth_header[len('Bearer '):]).get('sub')
+            except jwt.PyJWTError as e:
+                logger.info(f"Method 3 - Token rejected: {str(e)}")
+    
     logger.info(f"Extracted user_id: {user_id}")
     
     if not user_id:
-        return {
-            'statusCode': 401, 
-            'headers': headers, 
-            'body': json.dumps({
-                'error': 'Unauthorized', 
-                'debug': {
-                    'requestContext': request_context,
-                    'hasAuthorizer': 'authorizer' in request_context
-                }
-            })
-        }
+        return _respond(401, {
+            'error': 'Unauthorized',
+            'debug': {
+                'requestContext': request_context,
+                'hasAuthorizer': 'authorizer' in request_context
+            }
+        })
     
     method = event.get('httpMethod')
     
     if method == 'GET':
-        return get_certifications(user_id, headers)
+        return get_certifications(user_id)
     elif method == 'POST':
-        return create_certification(event, user_id, headers)
+        return create_certification(event, user_id)
+    
+    return _respond(405, {'error': 'Method not allowed'})
+
+@lru_cache(maxsize=1)
+def get_jwks_client():
+    """JWKS client for the user pool; fetches the key set once and caches signing keys by kid"""
+    return jwt.PyJWKClient(f"{TOKEN_ISSUER}/.well-known/jwks.json", cache_keys=True)
+
+def verify_token(token):
+    """Verify a Cognito ID token locally and return its claims"""
     
-    return {'statusCode': 405, 'headers': headers, 'body': json.dumps({'error': 'Method not allowed'})}
+    signing_key = get_jwks_client().get_signing_key_from_jwt(token)
+    return jwt.decode(
+        token,
+        signing_key.key,
+        algorithms=['RS256'],
+        audience=CLIENT_ID,
+        issuer=TOKEN_ISSUER
+    )
 
-def get_certifications(user_id, headers):
+def get_certifications(user_id):
     """Get user's certifications from DynamoDB"""
     
     try:
-        certs_table = dynamodb.Table(CERTIFICATIONS_TABLE)
-        
-        response = certs_table.query(
-            KeyConditionExpression='userId = :uid',
-            ExpressionAttributeValues={':uid': user_id}
+        # Follow LastEvaluatedKey so users past the 1 MB page limit get every item
+        pages = certs_table.meta.client.get_paginator('query').paginate(
+            TableName=CERTIFICATIONS_TABLE,
+            KeyConditionExpression=Key('userId').eq(user_id),
+            ProjectionExpression=LIST_PROJECTION,
+            ExpressionAttributeNames=LIST_ATTRIBUTE_NAMES
         )
         
-        certifications = response.get('Items', [])
+        certifications = [cert for page in pages for cert in page.get('Items', [])]
         
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'certifications': certifications,
-                'count': len(certifications)
-            })
-        }
+        return _respond(200, {
+            'certifications': certifications,
+            'count': len(certifications)
+        })
         
     except Exception as e:
         logger.error(f"Get certifications error: {str(e)}")
-        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+        return _respond(500, {'error': str(e)})
 
-def create_certification(event, user_id, headers):
+def create_certification(event, user_id):
     """Create new certification"""
     
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = event['_body']
         cert_id = str(uuid.uuid4())
-        
-        certs_table = dynamodb.Table(CERTIFICATIONS_TABLE)
+        now = datetime.now(timezone.utc)
+        now_iso = now.isoformat(timespec='seconds')
         
         # Calculate status based on expiry date
         expiry_date = datetime.strptime(body['expiryDate'], '%Y-%m-%d').date()
-        today = datetime.now().date()
-        days_until_expiry = (expiry_date - today).days
+        days_until_expiry = (expiry_date - now.date()).days
         
         if days_until_expiry < 0:
             status = 'expired'
@@ -292,22 +422,24 @@ def create_certification(event, user_id, headers):
             'expiryDate': body['expiryDate'],
             'status': status,
             'reminderDays': body.get('reminderDays', [90, 60, 30, 7]),
-            'createdAt': datetime.utcnow().isoformat(),
-            'updatedAt': datetime.utcnow().isoformat()
+            'createdAt': now_iso,
+            'updatedAt': now_iso
         }
         
         certs_table.put_item(Item=certification)
         
-        return {
-            'statusCode': 201,
-            'headers': headers,
-            'body': json.dumps({
-                'id': cert_id,
-                'message': 'Certification created successfully',
-                'certification': certification
-            })
-        }
+        return _respond(201, {
+            'id': cert_id,
+            'message': 'Certification created successfully',
+            'certification': certification
+        })
         
     except Exception as e:
         logger.error(f"Create certification error: {str(e)}")
-        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
\ No newline at end of file
+        return _respond(500, {'error': str(e)})
+
+# Resource handlers keyed by first path segment
+ROUTES = {
+    'auth': handle_auth,
+    'certifications': handle_certifications,
+}
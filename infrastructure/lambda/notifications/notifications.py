@@ -1,19 +1,59 @@
 import json
 import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Keep connections warm across invocations and leave room for concurrent calls
+CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 10}
+)
+
 # AWS clients
-dynamodb = boto3.resource('dynamodb')
-ses = boto3.client('ses')
+dynamodb = boto3.resource('dynamodb', config=CLIENT_CONFIG)
+ses = boto3.client('ses', config=CLIENT_CONFIG)
 
 # Environment variables
-CERTIFICATIONS_TABLE = os.environ.get('CERTIFICATIONS_TABLE')
-USERS_TABLE = os.environ.get('USERS_TABLE')
+CERTIFICATIONS_TABLE = os.environ.get('CERTIFICATIONS_TABLE', 'CertTracker-Certifications')
+USERS_TABLE = os.environ.get('USERS_TABLE', 'CertTracker-Users')
+EXPIRY_INDEX = os.environ.get('EXPIRY_INDEX', 'ExpiryIndex')
+
+# Table handles are built once per container
+certs_table = dynamodb.Table(CERTIFICATIONS_TABLE)
+
+# Only the fields needed to look up the user and fill in the email template
+EXPIRY_PROJECTION = 'userId, certId, #name, provider, expiryDate, #status'
+EXPIRY_ATTRIBUTE_NAMES = {'#name': 'name', '#status': 'status'}
+
+# Reminders go out this many days before expiry
+REMINDER_DAYS = [30, 60, 90]
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_LIMIT = 100
+BATCH_MAX_RETRIES = 5
+
+# SES template defined in the CDK stack; one bulk request carries at most 50 destinations
+EMAIL_TEMPLATE = os.environ.get('EMAIL_TEMPLATE', 'CertExpiry')
+SENDER_EMAIL = 'noreply@yourdomain.com'  # Update this to your verified SES email
+BULK_EMAIL_LIMIT = 50
+
+# SES sends are I/O bound; threads share the module-level client and its connection pool.
+# This caps concurrent bulk requests, not recipients per second: each worker can submit
+# BULK_EMAIL_LIMIT recipients at once, so it does not enforce the account's SES send rate.
+EMAIL_WORKERS = int(os.environ.get('EMAIL_WORKERS', '20'))
+
+# Per-recipient template data is the only part of a reminder built here; keep it compact
+_encode_template_data = json.JSONEncoder(separators=(',', ':')).encode
 
 def handler(event, context):
     """Check for expiring certifications and send email reminders"""
@@ -21,46 +61,34 @@ def handler(event, context):
     logger.info("Starting certification expiration check...")
     
     try:
-        certs_table = dynamodb.Table(CERTIFICATIONS_TABLE)
-        users_table = dynamodb.Table(USERS_TABLE)
-        
-        notifications_sent = 0
         today = datetime.now().date()
         
-        # Check for certifications expiring in 30, 60, 90 days
-        for days_ahead in [30, 60, 90]:
-            target_date = today + timedelta(days=days_ahead)
-            target_date_str = target_date.strftime('%Y-%m-%d')
-            
-            logger.info(f"Checking for certifications expiring on {target_date_str}")
-            
-            # Scan for expiring certifications
-            response = certs_table.scan(
-                FilterExpression='expiryDate = :date AND #status = :status',
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues={
-                    ':date': target_date_str,
-                    ':status': 'active'
-                }
-            )
-            
-            for cert in response.get('Items', []):
-                # Get user details
-                user_response = users_table.get_item(
-                    Key={'userId': cert['userId']}
-                )
-                
-                if 'Item' in user_response:
-                    user = user_response['Item']
-                    success = send_expiration_email(
-                        user['email'], 
-                        user['name'],
-                        cert['name'], 
-                        cert['provider'],
-                        days_ahead
-                    )
-                    if success:
-                        notifications_sent += 1
+        # Check for certifications expiring in 30, 60, 90 days; the queries are independent
+        with ThreadPoolExecutor(max_workers=len(REMINDER_DAYS)) as executor:
+            results = list(executor.map(partial(query_for_day, today), REMINDER_DAYS))
+        
+        expiring = [
+            (cert, days_ahead)
+            for days_ahead, certs in zip(REMINDER_DAYS, results)
+            for cert in certs
+        ]
+        
+        # Get user details for every affected user in batched round trips
+        users = get_users({cert['userId'] for cert, _ in expiring})
+        
+        tasks = []
+        for cert, days_ahead in expiring:
+            user = users.get(cert['userId'])
+            if user:
+                tasks.append((user['email'], user['name'], cert['name'], cert['provider'], days_ahead))
+        
+        batches = [tasks[start:start + BULK_EMAIL_LIMIT] for start in range(0, len(tasks), BULK_EMAIL_LIMIT)]
+        
+        # Most runs fit in a batch or two, so don't start threads that would sit idle
+        notifications_sent = 0
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(EMAIL_WORKERS, len(batches))) as executor:
+                notifications_sent = sum(executor.map(send_expiration_emails, batches))
         
         return {
             'statusCode': 200,
@@ -76,86 +104,79 @@ def handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
-def send_expiration_email(user_email, user_name, cert_name, provider, days_until_expiry):
-    """Send expiration reminder email via SES"""
+def query_for_day(today, days_ahead):
+    """Return active certifications expiring exactly days_ahead days after today"""
     
-    try:
-        subject = f"🚨 {cert_name} expires in {days_until_expiry} days"
+    target_date_str = (today + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+    logger.info(f"Checking for certifications expiring on {target_date_str}")
+    
+    # Query the expiry index for active certifications expiring that day, across all pages
+    pages = certs_table.meta.client.get_paginator('query').paginate(
+        TableName=CERTIFICATIONS_TABLE,
+        IndexName=EXPIRY_INDEX,
+        KeyConditionExpression=Key('status').eq('active') & Key('expiryDate').eq(target_date_str),
+        ProjectionExpression=EXPIRY_PROJECTION,
+        ExpressionAttributeNames=EXPIRY_ATTRIBUTE_NAMES
+    )
+    
+    return [cert for page in pages for cert in page.get('Items', [])]
+
+def get_users(user_ids):
+    """Fetch users by id with BatchGetItem, retrying unprocessed keys with backoff"""
+    
+    user_ids = list(user_ids)
+    users = {}
+    
+    for start in range(0, len(user_ids), BATCH_GET_LIMIT):
+        chunk = user_ids[start:start + BATCH_GET_LIMIT]
+        request_items = {USERS_TABLE: {'Keys': [{'userId': user_id} for user_id in chunk]}}
         
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background: linear-gradient(90deg, #2563eb 0%, #1d4ed8 100%); padding: 20px; text-align: center;">
-                <h1 style="color: white; margin: 0;">🛡️ CertTracker Alert</h1>
-            </div>
+        for attempt in range(BATCH_MAX_RETRIES):
+            response = dynamodb.batch_get_item(RequestItems=request_items)
             
-            <div style="padding: 30px; background: #f9fafb;">
-                <h2 style="color: #111827;">Hi {user_name},</h2>
-                
-                <div style="background: white; padding: 20px; border-radius: 8px; border-left: 4px solid #f59e0b;">
-                    <h3 style="color: #d97706; margin-top: 0;">⚠️ Certification Expiring Soon</h3>
-                    <p><strong>{cert_name}</strong> from <strong>{provider}</strong> will expire in <strong>{days_until_expiry} days</strong>.</p>
-                </div>
-                
-                <div style="margin: 20px 0;">
-                    <h4>Next Steps:</h4>
-                    <ul>
-                        <li>Check renewal requirements</li>
-                        <li>Schedule your renewal exam</li>
-                        <li>Complete any required CPE credits</li>
-                        <li>Update your certification in CertTracker</li>
-                    </ul>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="https://d30p8wd4n2r02p.cloudfront.net" 
-                       style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                        View in CertTracker
-                    </a>
-                </div>
-                
-                <p style="color: #6b7280; font-size: 14px; text-align: center;">
-                    Stay ahead of your certification renewals with CertTracker.<br>
-                    This is an automated reminder from your CertTracker account.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        text_body = f"""
-        CertTracker Certification Alert
-        
-        Hi {user_name},
-        
-        Your {cert_name} certification from {provider} will expire in {days_until_expiry} days.
-        
-        Next Steps:
-        - Check renewal requirements
-        - Schedule your renewal exam  
-        - Complete any required CPE credits
-        - Update your certification in CertTracker
-        
-        View your certifications: https://d30p8wd4n2r02p.cloudfront.net
-        
-        This is an automated reminder from CertTracker.
-        """
-        
-        response = ses.send_email(
-            Source='noreply@yourdomain.com',  # Update this to your verified SES email
-            Destination={'ToAddresses': [user_email]},
-            Message={
-                'Subject': {'Data': subject, 'Charset': 'UTF-8'},
-                'Body': {
-                    'Text': {'Data': text_body, 'Charset': 'UTF-8'},
-                    'Html': {'Data': html_body, 'Charset': 'UTF-8'}
+            for user in response.get('Responses', {}).get(USERS_TABLE, []):
+                users[user['userId']] = user
+            
+            request_items = response.get('UnprocessedKeys')
+            if not request_items:
+                break
+            time.sleep(2 ** attempt * 0.05)
+        else:
+            logger.error(f"Unprocessed user keys remain after {BATCH_MAX_RETRIES} attempts")
+    
+    return users
+
+def send_expiration_emails(tasks):
+    """Send up to 50 expiration reminders in one templated SES request; returns how many were accepted"""
+    
+    try:
+        response = ses.send_bulk_templated_email(
+            Source=SENDER_EMAIL,
+            Template=EMAIL_TEMPLATE,
+            DefaultTemplateData='{}',
+            Destinations=[
+                {
+                    'Destination': {'ToAddresses': [user_email]},
+                    'ReplacementTemplateData': _encode_template_data({
+                        'user_name': user_name,
+                        'cert_name': cert_name,
+                        'provider': provider,
+                        'days': days_until_expiry
+                    })
                 }
-            }
+                for user_email, user_name, cert_name, provider, days_until_expiry in tasks
+            ]
         )
-        
-        logger.info(f"Email sent to {user_email} for {cert_name}. MessageId: {response['MessageId']}")
-        return True
-        
     except Exception as e:
-        logger.error(f"Failed to send email to {user_email}: {str(e)}")
-        return False
\ No newline at end of file
+        logger.error(f"Failed to send {len(tasks)} emails: {str(e)}")
+        return 0
+    
+    sent = 0
+    for (user_email, _, cert_name, _, _), status in zip(tasks, response['Status']):
+        if status['Status'] == 'Success':
+            sent += 1
+            logger.info(f"Email sent to {user_email} for {cert_name}. MessageId: {status['MessageId']}")
+        else:
+            logger.error(f"Failed to send email to {user_email}: {status.get('Error', status['Status'])}")
+    
+    return sent
@@ -40,6 +40,15 @@ export class CertTrackerStack extends cdk.Stack {
       sortKey: { name: 'expirationDate', type: dynamodb.AttributeType.STRING },
     });
 
+    // GSI used by the notification Lambda to find active certifications expiring on a given day.
+    // Items store `expiryDate`, so ExpirationDateIndex above never indexes anything; remove it in a
+    // later deploy (DynamoDB allows only one GSI creation or deletion per update).
+    certificationsTable.addGlobalSecondaryIndex({
+      indexName: 'ExpiryIndex',
+      partitionKey: { name: 'status', type: dynamodb.AttributeType.STRING },
+      sortKey: { name: 'expiryDate', type: dynamodb.AttributeType.STRING },
+    });
+
     // Cognito User Pool (Free Tier: 50K MAU)
     const userPool = new cognito.UserPool(this, 'CertTrackerUserPool', {
       userPoolName: 'CertTracker-Users',
@@ -65,6 +74,71 @@ export class CertTrackerStack extends cdk.Stack {
       },
     });
 
+    // SES template for expiration reminders; the notification Lambda only sends per-user values
+    const expiryEmailTemplate = new ses.CfnTemplate(this, 'CertExpiryTemplate', {
+      template: {
+        templateName: 'CertExpiry',
+        subjectPart: '🚨 {{cert_name}} expires in {{days}} days',
+        htmlPart: `
+        <html>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(90deg, #2563eb 0%, #1d4ed8 100%); padding: 20px; text-align: center;">
+                <h1 style="color: white; margin: 0;">🛡️ CertTracker Alert</h1>
+            </div>
+            
+            <div style="padding: 30px; background: #f9fafb;">
+                <h2 style="color: #111827;">Hi {{user_name}},</h2>
+                
+                <div style="background: white; padding: 20px; border-radius: 8px; border-left: 4px solid #f59e0b;">
+                    <h3 style="color: #d97706; margin-top: 0;">⚠️ Certification Expiring Soon</h3>
+                    <p><strong>{{cert_name}}</strong> from <strong>{{provider}}</strong> will expire in <strong>{{days}} days</strong>.</p>
+                </div>
+                
+                <div style="margin: 20px 0;">
+                    <h4>Next Steps:</h4>
+                    <ul>
+                        <li>Check renewal requirements</li>
+                        <li>Schedule your renewal exam</li>
+                        <li>Complete any required CPE credits</li>
+                        <li>Update your certification in CertTracker</li>
+                    </ul>
+                </div>
+                
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="https://d30p8wd4n2r02p.cloudfront.net" 
+                       style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
+                        View in CertTracker
+                    </a>
+                </div>
+                
+                <p style="color: #6b7280; font-size: 14px; text-align: center;">
+                    Stay ahead of your certification renewals with CertTracker.<br>
+                    This is an automated reminder from your CertTracker account.
+                </p>
+            </div>
+        </body>
+        </html>
+        `,
+        textPart: `
+        CertTracker Certification Alert
+        
+        Hi {{user_name}},
+        
+        Your {{cert_name}} certification from {{provider}} will expire in {{days}} days.
+        
+        Next Steps:
+        - Check renewal requirements
+        - Schedule your renewal exam  
+        - Complete any required CPE credits
+        - Update your certification in CertTracker
+        
+        View your certifications: https://d30p8wd4n2r02p.cloudfront.net
+        
+        This is an automated reminder from CertTracker.
+        `,
+      },
+    });
+
     // Lambda Functions
     const apiLambda = new lambda.Function(this, 'ApiLambda', {
       runtime: lambda.Runtime.PYTHON_3_11,
@@ -86,6 +160,8 @@ export class CertTrackerStack extends cdk.Stack {
       environment: {
         CERTIFICATIONS_TABLE: certificationsTable.tableName,
         USERS_TABLE: usersTable.tableName,
+        EXPIRY_INDEX: 'ExpiryIndex',
+        EMAIL_TEMPLATE: expiryEmailTemplate.ref,
       },
       timeout: cdk.Duration.minutes(5),
     });
@@ -109,7 +185,7 @@ export class CertTrackerStack extends cdk.Stack {
 
     // Grant SES permissions
     notificationLambda.addToRolePolicy(new iam.PolicyStatement({
-      actions: ['ses:SendEmail', 'ses:SendRawEmail'],
+      actions: ['ses:SendEmail', 'ses:SendRawEmail', 'ses:SendBulkTemplatedEmail'],
       resources: ['*'],
     }));
 